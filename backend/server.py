@@ -1,29 +1,108 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, ValidationError
 from typing import List, Optional
+from collections import OrderedDict, defaultdict, deque
 import uuid
 from datetime import datetime, timezone, timedelta
 from contextlib import asynccontextmanager
+import asyncio
+import contextvars
+import cProfile
+import json
+import pstats
+import random
 import socketio
 import jwt
 from passlib.context import CryptContext
 import qrcode
-from io import BytesIO
+from io import BytesIO, StringIO
 import base64
+import csv
+import time
+from urllib.parse import parse_qs, urlencode
+import numpy as np
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Request profiling configuration (read early: the Mongo client and
+# Socket.IO server are only instrumented when profiling is enabled)
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+PROFILE_SAMPLE_PERCENT = float(os.environ.get('PROFILE_SAMPLE_PERCENT', '0'))
+PROFILE_RING_SIZE = int(os.environ.get('PROFILE_RING_SIZE', '50'))
+PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', '30'))
+PROFILE_HEADER = 'x-profile'
+
+# Profile of the request being handled, if it is being profiled
+current_profile = contextvars.ContextVar('current_profile', default=None)
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Record Mongo command timings on the profiled request.
+
+    Motor runs pymongo in executor threads with a copy of the caller's
+    context, so current_profile identifies the request issuing the command.
+    """
+
+    def started(self, event):
+        profile = current_profile.get()
+        if profile is not None:
+            collection = event.command.get(event.command_name)
+            profile.mongo_started[event.request_id] = (
+                event.command_name, collection if isinstance(collection, str) else None
+            )
+
+    def succeeded(self, event):
+        self._finish(event, True)
+
+    def failed(self, event):
+        self._finish(event, False)
+
+    def _finish(self, event, ok: bool):
+        profile = current_profile.get()
+        if profile is None:
+            return
+        command, collection = profile.mongo_started.pop(event.request_id, (event.command_name, None))
+        profile.mongo_calls.append({
+            "command": command,
+            "collection": collection,
+            "duration_ms": event.duration_micros / 1000,
+            "ok": ok,
+        })
+
+class ProfiledAsyncServer(socketio.AsyncServer):
+    """Socket.IO server that records emit timings on the profiled request."""
+
+    async def emit(self, event, *args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return await super().emit(event, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await super().emit(event, *args, **kwargs)
+        finally:
+            profile.emits.append({
+                "event": event,
+                "room": kwargs.get('room') or kwargs.get('to'),
+                "duration_ms": (time.perf_counter() - started) * 1000,
+            })
+
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    event_listeners=[MongoCommandTimer()] if PROFILING_ENABLED else []
+)
 db = client[os.environ.get('DB_NAME', 'warkop_db')]
 
 # JWT Configuration
@@ -31,6 +110,35 @@ JWT_SECRET = os.environ.get('JWT_SECRET', 'warkop-mamet-secret-key-change-in-pro
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24
 
+# Outlet configuration
+DEFAULT_OUTLET_ID = os.environ.get('DEFAULT_OUTLET_ID', 'main')
+MENU_CACHE_TTL_SECONDS = float(os.environ.get('MENU_CACHE_TTL_SECONDS', '60'))
+MENU_BULK_MAX_ROWS = int(os.environ.get('MENU_BULK_MAX_ROWS', '1000'))
+
+# Kitchen queue configuration
+ACTIVE_ORDER_STATUSES = ("pending", "accepted", "processing")
+KITCHEN_DEFAULT_PREP_SECONDS = float(os.environ.get('KITCHEN_DEFAULT_PREP_SECONDS', '180'))
+KITCHEN_PREP_SAMPLE_SIZE = int(os.environ.get('KITCHEN_PREP_SAMPLE_SIZE', '20'))
+
+# Order event streaming configuration
+ORDER_EVENT_SNAPSHOT_LIMIT = int(os.environ.get('ORDER_EVENT_SNAPSHOT_LIMIT', '10000'))
+ORDER_LONG_POLL_MAX_SECONDS = float(os.environ.get('ORDER_LONG_POLL_MAX_SECONDS', '60'))
+ORDER_SSE_KEEPALIVE_SECONDS = float(os.environ.get('ORDER_SSE_KEEPALIVE_SECONDS', '15'))
+
+# Analytics configuration
+ANALYTICS_UTC_OFFSET_HOURS = float(os.environ.get('ANALYTICS_UTC_OFFSET_HOURS', '7'))
+ANALYTICS_BASKET_BLOCK_ROWS = int(os.environ.get('ANALYTICS_BASKET_BLOCK_ROWS', '20000'))
+ANALYTICS_REFRESH_OVERLAP_SECONDS = float(os.environ.get('ANALYTICS_REFRESH_OVERLAP_SECONDS', '300'))
+
+# Export configuration
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+# Write-behind order ingestion configuration
+ORDER_WRITE_BEHIND = os.environ.get('ORDER_WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+ORDER_WAL_PATH = Path(os.environ.get('ORDER_WAL_PATH', str(ROOT_DIR / 'orders.wal')))
+ORDER_FLUSH_INTERVAL_MS = int(os.environ.get('ORDER_FLUSH_INTERVAL_MS', '50'))
+ORDER_FLUSH_MAX_BATCH = int(os.environ.get('ORDER_FLUSH_MAX_BATCH', '100'))
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -45,7 +153,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # ✅ PERBAIKAN: Socket.IO dengan CORS yang benar
-sio = socketio.AsyncServer(
+sio = (ProfiledAsyncServer if PROFILING_ENABLED else socketio.AsyncServer)(
     async_mode='asgi',
     cors_allowed_origins=['http://localhost:3000', 'http://127.0.0.1:3000'],
     logger=True,
@@ -129,9 +237,70 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error creating menu items: {e}")
     
+    # Ensure indexes
+    try:
+        await db.orders.create_index("id", unique=True)
+        await db.orders.create_index([("outlet_id", 1), ("created_at", -1)])
+        await db.orders.create_index([("outlet_id", 1), ("status", 1), ("created_at", -1)])
+        await db.orders.create_index([("outlet_id", 1), ("updated_at", 1)])
+        await db.menu_items.create_index("id", unique=True)
+        await db.menu_items.create_index([("outlet_id", 1), ("available", 1)])
+        await db.menu_items.create_index([("outlet_id", 1), ("name", 1)])
+    except Exception as e:
+        logger.error(f"Error creating indexes: {e}")
+    
+    # Replay orders acknowledged but not yet flushed before the last shutdown
+    try:
+        replayed = await order_ingest.replay()
+        if replayed:
+            logger.info(f"Replayed {replayed} orders from write-ahead log")
+    except Exception as e:
+        logger.error(f"Error replaying order write-ahead log: {e}")
+    
+    # Orders left pending by a failed replay are retried by the flush task
+    if ORDER_WRITE_BEHIND or order_ingest.has_pending():
+        order_ingest.start()
+    if ORDER_WRITE_BEHIND:
+        logger.info("Write-behind order ingestion enabled")
+    
+    # Assign documents created before multi-outlet support to the default outlet
+    try:
+        for collection in (db.admin_users, db.menu_items, db.orders):
+            result = await collection.update_many(
+                {"outlet_id": {"$exists": False}},
+                {"$set": {"outlet_id": DEFAULT_OUTLET_ID}}
+            )
+            if result.modified_count:
+                logger.info(f"Assigned {result.modified_count} {collection.name} to outlet {DEFAULT_OUTLET_ID}")
+    except Exception as e:
+        logger.error(f"Error migrating outlet ids: {e}")
+    
+    # Load outlet ids that customer requests are checked against
+    try:
+        await load_known_outlets()
+        logger.info(f"Known outlets: {', '.join(sorted(known_outlets))}")
+    except Exception as e:
+        logger.error(f"Error loading outlets: {e}")
+    
+    # Rebuild kitchen queue from active orders
+    try:
+        active_orders = await db.orders.find(
+            {"status": {"$in": list(ACTIVE_ORDER_STATUSES)}},
+            {"_id": 0, "id": 1, "outlet_id": 1, "items": 1, "status": 1, "created_at": 1, "updated_at": 1}
+        ).sort("created_at", 1).to_list(None)
+        orders_by_outlet = defaultdict(list)
+        for order in active_orders:
+            orders_by_outlet[order.get('outlet_id', DEFAULT_OUTLET_ID)].append(order)
+        for outlet_id, outlet_orders in orders_by_outlet.items():
+            get_kitchen_queue(outlet_id).rebuild(outlet_orders)
+        logger.info(f"Kitchen queue rebuilt with {len(active_orders)} active orders")
+    except Exception as e:
+        logger.error(f"Error rebuilding kitchen queue: {e}")
+    
     yield
     
     logger.info("Shutting down application...")
+    await order_ingest.stop()
     client.close()
 
 # Create FastAPI app
@@ -155,17 +324,20 @@ class AdminUser(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     username: str
     password_hash: str
+    outlet_id: str = DEFAULT_OUTLET_ID
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class MenuItem(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    outlet_id: str = DEFAULT_OUTLET_ID
     name: str
     category: str
     price: float
     image_url: str
     description: str
     available: bool = True
+    stock: Optional[int] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class MenuItemCreate(BaseModel):
@@ -175,6 +347,7 @@ class MenuItemCreate(BaseModel):
     image_url: str
     description: str
     available: bool = True
+    stock: Optional[int] = Field(None, ge=0)
 
 class MenuItemUpdate(BaseModel):
     name: Optional[str] = None
@@ -183,16 +356,18 @@ class MenuItemUpdate(BaseModel):
     image_url: Optional[str] = None
     description: Optional[str] = None
     available: Optional[bool] = None
+    stock: Optional[int] = Field(None, ge=0)
 
 class OrderItem(BaseModel):
     menu_item_id: str
     name: str
     price: float
-    quantity: int
+    quantity: int = Field(gt=0)
 
 class Order(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    outlet_id: str = DEFAULT_OUTLET_ID
     customer_name: str
     table_number: Optional[str] = None
     items: List[OrderItem]
@@ -202,6 +377,7 @@ class Order(BaseModel):
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class OrderCreate(BaseModel):
+    outlet_id: str = DEFAULT_OUTLET_ID
     customer_name: str
     table_number: Optional[str] = None
     items: List[OrderItem]
@@ -217,40 +393,1131 @@ class LoginRequest(BaseModel):
 class LoginResponse(BaseModel):
     token: str
     username: str
+    outlet_id: str
+
+class AdminContext(BaseModel):
+    username: str
+    outlet_id: str
+
+class QueueStatus(BaseModel):
+    order_id: str
+    status: str
+    position: Optional[int] = None
+    orders_ahead: Optional[int] = None
+    eta_seconds: Optional[int] = None
+    estimated_ready_at: Optional[datetime] = None
 
 # Utility functions
-def create_jwt_token(username: str) -> str:
+def create_jwt_token(username: str, outlet_id: str) -> str:
     expiration = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
     payload = {
         "sub": username,
+        "outlet_id": outlet_id,
         "exp": expiration
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-def verify_jwt_token(token: str) -> Optional[str]:
+def decode_jwt_token(token: str) -> Optional[dict]:
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload.get("sub")
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
-    token = credentials.credentials
-    username = verify_jwt_token(token)
-    if username is None:
+async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(security)) -> AdminContext:
+    payload = decode_jwt_token(credentials.credentials)
+    if payload is None or payload.get("sub") is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token"
         )
+    username = payload["sub"]
     user = await db.admin_users.find_one({"username": username}, {"_id": 0})
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    return username
+    # Tokens issued before outlet claims fall back to the user's outlet
+    outlet_id = payload.get("outlet_id") or user.get("outlet_id", DEFAULT_OUTLET_ID)
+    return AdminContext(username=username, outlet_id=outlet_id)
+
+def admin_room(outlet_id: str) -> str:
+    return f"admin_{outlet_id}"
+
+# Outlets
+# Customer-supplied outlet ids are checked against these before they can
+# create per-outlet state (kitchen queues, menu cache entries, rooms)
+known_outlets = {DEFAULT_OUTLET_ID}
+
+async def load_known_outlets() -> None:
+    for collection in (db.admin_users, db.menu_items):
+        known_outlets.update(
+            outlet_id for outlet_id in await collection.distinct("outlet_id")
+            if isinstance(outlet_id, str)
+        )
+
+async def is_known_outlet(outlet_id: str) -> bool:
+    if outlet_id in known_outlets:
+        return True
+    # Outlets added after startup; misses are not cached so arbitrary
+    # strings cannot grow the set
+    if await db.admin_users.find_one({"outlet_id": outlet_id}, {"_id": 1}) is None:
+        return False
+    known_outlets.add(outlet_id)
+    return True
+
+async def require_outlet(outlet_id: str) -> None:
+    if not await is_known_outlet(outlet_id):
+        raise HTTPException(status_code=404, detail="Outlet not found")
+
+def parse_datetime(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value
+
+# Order Events
+class OrderEventHub:
+    """In-process per-order notification registry for SSE and long-poll.
+
+    Each waiting customer owns a small asyncio.Queue registered under its
+    order id, so an idle waiter is just a parked coroutine. The latest order
+    document is kept in a bounded LRU so re-polls need no Mongo read.
+    """
+
+    def __init__(self, snapshot_limit: int, subscriber_buffer: int = 16):
+        self.snapshot_limit = snapshot_limit
+        self.subscriber_buffer = subscriber_buffer
+        self._subscribers = defaultdict(set)
+        self._snapshots = OrderedDict()
+
+    def subscribe(self, order_id: str) -> asyncio.Queue:
+        subscription = asyncio.Queue(maxsize=self.subscriber_buffer)
+        self._subscribers[order_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, order_id: str, subscription: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(order_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[order_id]
+
+    def publish(self, order_id: str, event: str, data: dict) -> None:
+        for subscription in self._subscribers.get(order_id, ()):
+            if subscription.full():
+                # Slow consumer: drop its oldest event rather than block publishers
+                subscription.get_nowait()
+            subscription.put_nowait((event, data))
+
+    def snapshot(self, order_id: str) -> Optional[dict]:
+        order = self._snapshots.get(order_id)
+        if order is not None:
+            self._snapshots.move_to_end(order_id)
+        return order
+
+    def remember(self, order: dict) -> None:
+        self._snapshots[order['id']] = order
+        self._snapshots.move_to_end(order['id'])
+        while len(self._snapshots) > self.snapshot_limit:
+            self._snapshots.popitem(last=False)
+
+order_events = OrderEventHub(ORDER_EVENT_SNAPSHOT_LIMIT)
+
+async def load_order_snapshot(order_id: str) -> Optional[dict]:
+    order = order_events.snapshot(order_id) or order_ingest.get_pending(order_id)
+    if order is None:
+        order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+        if order is not None:
+            order_events.remember(order)
+    return order
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+# Kitchen Queue
+class KitchenQueue:
+    """In-memory FIFO of active orders with per-order position and ETA.
+
+    Positions and ready times are recomputed whenever the queue changes, so
+    lookups from customers are O(1) dict reads. Preparation time per menu
+    item is the mean of its most recent completed orders.
+    """
+
+    def __init__(self, default_prep_seconds: float, sample_size: int):
+        self.default_prep_seconds = default_prep_seconds
+        self._entries = {}
+        self._positions = {}
+        self._ready_at = {}
+        self._prep_samples = defaultdict(lambda: deque(maxlen=sample_size))
+
+    def rebuild(self, orders: list) -> None:
+        self._entries.clear()
+        for order in sorted(orders, key=lambda o: parse_datetime(o['created_at'])):
+            self._entries[order['id']] = self._make_entry(order)
+        self._positions.clear()
+        self._reindex()
+
+    def add(self, order: dict) -> dict:
+        self._entries[order['id']] = self._make_entry(order)
+        return self._reindex()
+
+    def update_status(self, order: dict, new_status: str, at: datetime) -> dict:
+        order_id = order['id']
+        entry = self._entries.get(order_id)
+        if entry is None:
+            if new_status not in ACTIVE_ORDER_STATUSES:
+                return {}
+            # Reopened order re-joins at the back of the queue
+            entry = self._entries[order_id] = self._make_entry({**order, "status": "pending"})
+        if new_status in ACTIVE_ORDER_STATUSES:
+            if new_status == "processing" and entry['started_at'] is None:
+                entry['started_at'] = at
+            entry['status'] = new_status
+        else:
+            del self._entries[order_id]
+            self._positions.pop(order_id, None)
+            self._ready_at.pop(order_id, None)
+            if new_status == "completed":
+                self._record_prep_time(entry, at)
+        return self._reindex()
+
+    def get(self, order_id: str) -> Optional[dict]:
+        position = self._positions.get(order_id)
+        if position is None:
+            return None
+        ready_at = self._ready_at[order_id]
+        now = datetime.now(timezone.utc)
+        return {
+            "order_id": order_id,
+            "status": self._entries[order_id]['status'],
+            "position": position,
+            "orders_ahead": position - 1,
+            "eta_seconds": max(int((ready_at - now).total_seconds()), 0),
+            "estimated_ready_at": ready_at,
+        }
+
+    def estimate_prep_seconds(self, items: list) -> float:
+        total = 0.0
+        for menu_item_id, quantity in items:
+            samples = self._prep_samples.get(menu_item_id)
+            per_unit = sum(samples) / len(samples) if samples else self.default_prep_seconds
+            total += per_unit * quantity
+        return total
+
+    def _make_entry(self, order: dict) -> dict:
+        started_at = None
+        if order.get('status') == "processing":
+            started_at = parse_datetime(order.get('updated_at') or order['created_at'])
+        return {
+            "status": order.get('status', "pending"),
+            "items": [(item['menu_item_id'], item['quantity']) for item in order['items']],
+            "started_at": started_at,
+        }
+
+    def _record_prep_time(self, entry: dict, completed_at: datetime) -> None:
+        if entry['started_at'] is None:
+            return
+        units = sum(quantity for _, quantity in entry['items'])
+        if units <= 0:
+            return
+        per_unit = (completed_at - entry['started_at']).total_seconds() / units
+        for menu_item_id, _ in entry['items']:
+            self._prep_samples[menu_item_id].append(per_unit)
+
+    def _reindex(self) -> dict:
+        """Recompute positions and ETAs, returning entries whose position changed."""
+        now = datetime.now(timezone.utc)
+        changed = {}
+        elapsed = 0.0
+        for position, (order_id, entry) in enumerate(self._entries.items(), start=1):
+            remaining = self.estimate_prep_seconds(entry['items'])
+            if entry['started_at'] is not None:
+                remaining = max(remaining - (now - entry['started_at']).total_seconds(), 0.0)
+            elapsed += remaining
+            self._ready_at[order_id] = now + timedelta(seconds=elapsed)
+            if self._positions.get(order_id) != position:
+                self._positions[order_id] = position
+                changed[order_id] = position
+        return changed
+
+# One kitchen per outlet, each with its own queue
+kitchen_queues = {}
+
+def get_kitchen_queue(outlet_id: str) -> KitchenQueue:
+    queue = kitchen_queues.get(outlet_id)
+    if queue is None:
+        queue = kitchen_queues[outlet_id] = KitchenQueue(KITCHEN_DEFAULT_PREP_SECONDS, KITCHEN_PREP_SAMPLE_SIZE)
+    return queue
+
+def find_queue_status(order_id: str) -> Optional[dict]:
+    for queue in kitchen_queues.values():
+        queue_status = queue.get(order_id)
+        if queue_status is not None:
+            return queue_status
+    return None
+
+async def emit_queue_updates(queue: KitchenQueue, changed: dict) -> None:
+    for order_id in changed:
+        queue_status = queue.get(order_id)
+        if queue_status is None:
+            continue
+        queue_status['estimated_ready_at'] = queue_status['estimated_ready_at'].isoformat()
+        order_events.publish(order_id, 'queue_position_updated', queue_status)
+        try:
+            await sio.emit('queue_position_updated', queue_status, room=f"order_{order_id}")
+        except Exception as e:
+            logger.error(f"Error emitting queue update: {e}")
+
+# Order Analytics Snapshot
+ORDER_STATUS_CODES = {"pending": 0, "accepted": 1, "processing": 2, "completed": 3, "cancelled": 4}
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+def grow_array(array: np.ndarray, min_size: int) -> np.ndarray:
+    grown = np.zeros(max(min_size, len(array) * 2), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+class OrderColumns:
+    """Columnar in-memory copy of one outlet's orders for vectorised analytics.
+
+    Each order is a row in parallel NumPy arrays (creation time, total,
+    status code). Line items are stored CSR-style: the entries of row r are
+    item_index/item_quantity[item_indptr[r]:item_indptr[r + 1]], where
+    item_index is a dense column number assigned per menu_item_id.
+
+    refresh() re-reads orders by updated_at, so status changes and inserts
+    made by other workers are picked up. It reaches back
+    ANALYTICS_REFRESH_OVERLAP_SECONDS before the newest updated_at seen,
+    because an order's timestamps are set before it is written: an order
+    that reaches Mongo later than that (e.g. another worker's write-behind
+    backlog during an outage) is missed until the process restarts.
+    """
+
+    def __init__(self, outlet_id: str, capacity: int = 1024):
+        self.outlet_id = outlet_id
+        self.size = 0
+        self.nnz = 0
+        self.created_ts = np.zeros(capacity, dtype=np.int64)
+        self.totals = np.zeros(capacity, dtype=np.float64)
+        self.status_codes = np.zeros(capacity, dtype=np.int8)
+        self.item_indptr = np.zeros(capacity + 1, dtype=np.int64)
+        self.item_index = np.zeros(capacity * 2, dtype=np.int32)
+        self.item_quantity = np.zeros(capacity * 2, dtype=np.int32)
+        self.item_ids = []
+        self.item_names = []
+        self._item_columns = {}
+        self._rows = {}
+        self._synced_until = None
+        self._refresh_lock = asyncio.Lock()
+
+    async def refresh(self) -> None:
+        """Load orders created or updated since the last refresh."""
+        async with self._refresh_lock:
+            query = {"outlet_id": self.outlet_id}
+            if self._synced_until is not None:
+                since = self._synced_until - timedelta(seconds=ANALYTICS_REFRESH_OVERLAP_SECONDS)
+                query["updated_at"] = {"$gte": since.isoformat()}
+            projection = {
+                "_id": 0, "id": 1, "created_at": 1, "updated_at": 1, "total": 1, "status": 1,
+                "items.menu_item_id": 1, "items.name": 1, "items.quantity": 1
+            }
+            cursor = db.orders.find(query, projection).batch_size(EXPORT_BATCH_SIZE)
+            async for order in cursor:
+                if order['id'] in self._rows:
+                    self.update_status(order['id'], order.get('status'))
+                else:
+                    self.add(order)
+                updated_at = parse_datetime(order.get('updated_at') or order['created_at'])
+                if self._synced_until is None or updated_at > self._synced_until:
+                    self._synced_until = updated_at
+
+    def add(self, order: dict) -> None:
+        if order['id'] in self._rows:
+            return
+        row = self.size
+        items = order.get('items', [])
+        if row + 1 >= len(self.created_ts):
+            self.created_ts = grow_array(self.created_ts, row + 1)
+            self.totals = grow_array(self.totals, row + 1)
+            self.status_codes = grow_array(self.status_codes, row + 1)
+            self.item_indptr = grow_array(self.item_indptr, row + 2)
+        if self.nnz + len(items) > len(self.item_index):
+            self.item_index = grow_array(self.item_index, self.nnz + len(items))
+            self.item_quantity = grow_array(self.item_quantity, self.nnz + len(items))
+
+        self.created_ts[row] = int(parse_datetime(order['created_at']).timestamp())
+        self.totals[row] = order.get('total', 0)
+        self.status_codes[row] = ORDER_STATUS_CODES.get(order.get('status'), -1)
+        for item in items:
+            self.item_index[self.nnz] = self._item_column(item['menu_item_id'], item.get('name'))
+            self.item_quantity[self.nnz] = item.get('quantity', 0)
+            self.nnz += 1
+        self.item_indptr[row + 1] = self.nnz
+        self._rows[order['id']] = row
+        self.size += 1
+
+    def update_status(self, order_id: str, new_status: str) -> None:
+        row = self._rows.get(order_id)
+        if row is not None:
+            self.status_codes[row] = ORDER_STATUS_CODES.get(new_status, -1)
+
+    def heatmap(self, start_ts: Optional[float], end_ts: Optional[float], utc_offset_hours: float) -> dict:
+        mask = self._mask(start_ts, end_ts)
+        local_ts = self.created_ts[:self.size][mask] + int(utc_offset_hours * 3600)
+        # 1970-01-01 was a Thursday; shift so Monday is 0
+        weekday = (local_ts // 86400 + 3) % 7
+        hour = (local_ts % 86400) // 3600
+        cell = weekday * 24 + hour
+        totals = self.totals[:self.size][mask]
+        orders = np.bincount(cell, minlength=7 * 24).reshape(7, 24)
+        revenue = np.bincount(cell, weights=totals, minlength=7 * 24).reshape(7, 24)
+        total_orders = int(mask.sum())
+        return {
+            "weekdays": WEEKDAY_NAMES,
+            "utc_offset_hours": utc_offset_hours,
+            "orders": orders.tolist(),
+            "revenue": revenue.tolist(),
+            "total_orders": total_orders,
+            "total_revenue": float(totals.sum()),
+            "average_ticket": float(totals.mean()) if total_orders else 0.0,
+        }
+
+    def basket(self, start_ts: Optional[float], end_ts: Optional[float], limit: int, min_count: int) -> dict:
+        mask = self._mask(start_ts, end_ts)
+        n_items = len(self.item_ids)
+        total_orders = int(mask.sum())
+        if total_orders == 0 or n_items < 2:
+            return {"total_orders": total_orders, "pairs": []}
+
+        # Co-occurrence = X^T X over the binary order x item matrix, built in
+        # row blocks so memory stays bounded by the block size
+        indptr = self.item_indptr[:self.size + 1]
+        cooccurrence = np.zeros((n_items, n_items), dtype=np.float64)
+        for block_start in range(0, self.size, ANALYTICS_BASKET_BLOCK_ROWS):
+            block_end = min(block_start + ANALYTICS_BASKET_BLOCK_ROWS, self.size)
+            first, last = indptr[block_start], indptr[block_end]
+            entry_rows = np.repeat(np.arange(block_start, block_end), np.diff(indptr[block_start:block_end + 1]))
+            block = np.zeros((block_end - block_start, n_items), dtype=np.float32)
+            block[entry_rows - block_start, self.item_index[first:last]] = 1.0
+            block[~mask[block_start:block_end]] = 0.0
+            cooccurrence += block.T @ block
+
+        item_orders = np.diag(cooccurrence)
+        first_items, second_items = np.triu_indices(n_items, k=1)
+        pair_orders = cooccurrence[first_items, second_items]
+        selected = np.nonzero(pair_orders >= max(min_count, 1))[0]
+        selected = selected[np.argsort(-pair_orders[selected], kind="stable")][:limit]
+
+        pairs = []
+        for index in selected:
+            a, b = first_items[index], second_items[index]
+            together = pair_orders[index]
+            support = together / total_orders
+            pairs.append({
+                "item_a": {"menu_item_id": self.item_ids[a], "name": self.item_names[a]},
+                "item_b": {"menu_item_id": self.item_ids[b], "name": self.item_names[b]},
+                "orders": int(together),
+                "support": float(support),
+                "confidence_a_to_b": float(together / item_orders[a]),
+                "confidence_b_to_a": float(together / item_orders[b]),
+                "lift": float(support / ((item_orders[a] / total_orders) * (item_orders[b] / total_orders))),
+            })
+        return {"total_orders": total_orders, "pairs": pairs}
+
+    def _mask(self, start_ts: Optional[float], end_ts: Optional[float]) -> np.ndarray:
+        mask = self.status_codes[:self.size] != ORDER_STATUS_CODES["cancelled"]
+        if start_ts is not None:
+            mask &= self.created_ts[:self.size] >= start_ts
+        if end_ts is not None:
+            mask &= self.created_ts[:self.size] < end_ts
+        return mask
+
+    def _item_column(self, menu_item_id: str, name: Optional[str]) -> int:
+        column = self._item_columns.get(menu_item_id)
+        if column is None:
+            column = self._item_columns[menu_item_id] = len(self.item_ids)
+            self.item_ids.append(menu_item_id)
+            self.item_names.append(name)
+        elif name:
+            # Keep the most recent name seen for the item
+            self.item_names[column] = name
+        return column
+
+# Loaded lazily on the first analytics request for an outlet
+order_columns = {}
+
+async def get_order_columns(outlet_id: str) -> OrderColumns:
+    columns = order_columns.get(outlet_id)
+    if columns is None:
+        columns = order_columns[outlet_id] = OrderColumns(outlet_id)
+    await columns.refresh()
+    return columns
+
+# Menu Cache
+class MenuCache:
+    """Per-outlet cache of the public menu, invalidated on menu writes."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+
+    def get(self, outlet_id: str) -> Optional[list]:
+        entry = self._entries.get(outlet_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, outlet_id: str, items: list) -> None:
+        self._entries[outlet_id] = (time.monotonic() + self.ttl_seconds, items)
+
+    def invalidate(self, outlet_id: str) -> None:
+        self._entries.pop(outlet_id, None)
+
+menu_cache = MenuCache(MENU_CACHE_TTL_SECONDS)
+
+# Menu Updates
+def menu_update_fields(item: MenuItemUpdate) -> dict:
+    """Build the $set document for a menu item update."""
+    update_data = {k: v for k, v in item.model_dump().items() if v is not None}
+    if 'stock' in item.model_fields_set and item.stock is None:
+        # Explicit null turns stock tracking off
+        update_data['stock'] = None
+    elif item.stock is not None and item.available is None:
+        # Restocking makes the item orderable again; zero sells it out
+        update_data['available'] = item.stock > 0
+    return update_data
+
+# Bulk Menu Import
+def parse_bulk_menu_rows(body: bytes, content_type: str) -> list:
+    """Parse a bulk menu request body (JSON list/{"items": [...]} or CSV) into dict rows."""
+    if content_type.startswith("text/csv"):
+        reader = csv.DictReader(StringIO(body.decode("utf-8-sig")))
+        # Empty CSV cells mean "leave unchanged", not an empty value
+        return [
+            {key.strip(): value.strip() for key, value in row.items() if key and value not in (None, "")}
+            for row in reader
+        ]
+    try:
+        payload = json.loads(body or b"null")
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    if isinstance(payload, dict):
+        payload = payload.get("items")
+    if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+        raise HTTPException(status_code=400, detail="Body must be a list of menu item objects or CSV")
+    return payload
+
+def format_validation_errors(error: ValidationError) -> list:
+    return [f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in error.errors()]
+
+# Menu Stock
+def menu_room(outlet_id: str) -> str:
+    return f"menu_{outlet_id}"
+
+async def reserve_stock(outlet_id: str, items: List[OrderItem]) -> dict:
+    """Atomically decrement stock for the stock-tracked items of an order.
+
+    Each item is a single pipeline update that decrements stock only while
+    it is a number and enough is left, and returns the document as it was
+    before. One round trip per item (run concurrently) therefore both
+    reserves stock and tells tracked, untracked and short items apart, and
+    concurrent checkouts never oversell. If any item falls short, the
+    decrements that did succeed are restored and a 409 is raised; lines for
+    items that are not on this outlet's menu are rejected with a 400.
+    Returns {menu_item_id: remaining stock}.
+    """
+    quantities = defaultdict(int)
+    names = {}
+    for item in items:
+        quantities[item.menu_item_id] += item.quantity
+        names[item.menu_item_id] = item.name
+    
+    item_ids = list(quantities)
+    before = await asyncio.gather(*(
+        db.menu_items.find_one_and_update(
+            {"id": item_id, "outlet_id": outlet_id},
+            [{"$set": {"stock": {"$cond": [
+                {"$and": [{"$isNumber": "$stock"}, {"$gte": ["$stock", quantities[item_id]]}]},
+                {"$subtract": ["$stock", quantities[item_id]]},
+                "$stock"
+            ]}}}],
+            projection={"_id": 0, "id": 1, "stock": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        for item_id in item_ids
+    ))
+    remaining = {}
+    short = []
+    unknown = []
+    for item_id, doc in zip(item_ids, before):
+        if doc is None:
+            unknown.append(item_id)
+            continue
+        stock = doc.get('stock')
+        if not isinstance(stock, (int, float)) or isinstance(stock, bool):
+            continue
+        if stock >= quantities[item_id]:
+            remaining[item_id] = stock - quantities[item_id]
+        else:
+            short.append(item_id)
+    if unknown or short:
+        await release_stock(outlet_id, {item_id: quantities[item_id] for item_id in remaining})
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Not on this outlet's menu: {', '.join(names[item_id] for item_id in unknown)}"
+        )
+    if short:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Insufficient stock for: {', '.join(names[item_id] for item_id in short)}"
+        )
+    return remaining
+
+async def release_stock(outlet_id: str, quantities: dict) -> None:
+    if not quantities:
+        return
+    await asyncio.gather(*(
+        db.menu_items.update_one({"id": item_id, "outlet_id": outlet_id}, {"$inc": {"stock": quantity}})
+        for item_id, quantity in quantities.items()
+    ))
+
+async def mark_sold_out(outlet_id: str, item_ids: list) -> None:
+    """Flip items that reached zero stock to unavailable and notify clients."""
+    if not item_ids:
+        return
+    # Runs after the order is stored, so a failure here must not fail checkout
+    try:
+        # Guard on stock still being zero in case an admin restocked meanwhile
+        await db.menu_items.update_many(
+            {"id": {"$in": item_ids}, "outlet_id": outlet_id, "stock": 0},
+            {"$set": {"available": False}}
+        )
+    except Exception as e:
+        logger.error(f"Error marking items sold out: {e}")
+        return
+    finally:
+        menu_cache.invalidate(outlet_id)
+    for item_id in item_ids:
+        update_data = {"id": item_id, "stock": 0, "available": False}
+        try:
+            await sio.emit('menu_item_updated', update_data, room=menu_room(outlet_id))
+            await sio.emit('menu_item_updated', update_data, room=admin_room(outlet_id))
+        except Exception as e:
+            logger.error(f"Error emitting socket event: {e}")
+
+# Order Export
+ORDER_EXPORT_COLUMNS = [
+    "order_id", "created_at", "updated_at", "customer_name", "table_number",
+    "status", "item_count", "total"
+]
+ITEM_EXPORT_COLUMNS = [
+    "order_id", "created_at", "updated_at", "customer_name", "table_number",
+    "status", "menu_item_id", "item_name", "price", "quantity", "subtotal", "order_total"
+]
+
+def parse_export_bound(value: Optional[str], name: str, end: bool = False) -> Optional[str]:
+    """Parse a from/to query value into the ISO string format stored in Mongo.
+
+    A bare date for the upper bound is treated as inclusive of that whole day.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid '{name}' date: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+def parse_analytics_range(from_: Optional[str], to: Optional[str]) -> tuple:
+    start = parse_export_bound(from_, "from")
+    end = parse_export_bound(to, "to", end=True)
+    return (
+        datetime.fromisoformat(start).timestamp() if start else None,
+        datetime.fromisoformat(end).timestamp() if end else None,
+    )
+
+def order_export_rows(order: dict, rows: str) -> list:
+    base = [
+        order['id'], order['created_at'], order.get('updated_at'),
+        order.get('customer_name'), order.get('table_number'), order.get('status'),
+    ]
+    if rows == "order":
+        item_count = sum(item['quantity'] for item in order.get('items', []))
+        return [base + [item_count, order.get('total')]]
+    return [
+        base + [
+            item['menu_item_id'], item['name'], item['price'], item['quantity'],
+            item['price'] * item['quantity'], order.get('total')
+        ]
+        for item in order.get('items', [])
+    ]
+
+async def iter_export_batches(query: dict, rows: str):
+    cursor = db.orders.find(query, {"_id": 0}).sort("created_at", 1).batch_size(EXPORT_BATCH_SIZE)
+    batch = []
+    async for order in cursor:
+        batch.extend(order_export_rows(order, rows))
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def stream_orders_csv(query: dict, rows: str, columns: list):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in iter_export_batches(query, rows):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+class ParquetChunkSink:
+    """Write-only file object that hands written bytes back in chunks.
+
+    ParquetWriter records row group offsets from tell(), so the position keeps
+    counting across drains even though the buffered bytes are released.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return False
+
+    def seekable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+async def stream_orders_parquet(query: dict, rows: str, columns: list):
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    column_types = {
+        "created_at": pa.timestamp("us", tz="UTC"),
+        "updated_at": pa.timestamp("us", tz="UTC"),
+        "item_count": pa.int64(),
+        "quantity": pa.int64(),
+        "price": pa.float64(),
+        "subtotal": pa.float64(),
+        "total": pa.float64(),
+        "order_total": pa.float64(),
+    }
+    schema = pa.schema([(column, column_types.get(column, pa.string())) for column in columns])
+    sink = ParquetChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def write_row_group(batch):
+        frame = pd.DataFrame(batch, columns=columns)
+        for column in ("created_at", "updated_at"):
+            frame[column] = pd.to_datetime(frame[column], utc=True, format="ISO8601")
+        writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+        return sink.drain()
+
+    async for batch in iter_export_batches(query, rows):
+        yield await run_in_threadpool(write_row_group, batch)
+    writer.close()
+    yield sink.drain()
+
+# Write-behind Order Ingestion
+async def insert_orders_idempotent(docs: list) -> None:
+    """Insert orders, ignoring ones already stored (unique index on id)."""
+    try:
+        await db.orders.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(error.get('code') != 11000 for error in errors):
+            raise
+
+class OrderWriteBehind:
+    """Acknowledge orders once they are fsynced to a local WAL, then batch
+    them into db.orders with insert_many.
+
+    The WAL is a series of segment files. Each flush first rotates to a new
+    segment, so orders arriving during insert_many land in the new file, and
+    a sealed segment is deleted once all of its orders are in Mongo. Orders
+    arriving while an fsync is in flight are group-committed by the next
+    one. All WAL file work is serialized by an asyncio lock and runs in the
+    threadpool, so the event loop never blocks on disk. Replay after a crash
+    is idempotent because duplicate ids are rejected by the unique index.
+    """
+
+    def __init__(self, wal_path: Path, flush_interval_ms: int, max_batch: int):
+        self.wal_path = wal_path
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self._pending = {}
+        # Segment path -> ids of its orders not yet in Mongo, oldest first
+        self._segments = {}
+        self._unsynced = []
+        self._next_segment = 0
+        self._segment_path = None
+        self._wal_lock = None
+        self._flush_lock = None
+        self._wakeup = None
+        self._sync_task = None
+        self._wal = None
+        self._task = None
+
+    def get_pending(self, order_id: str) -> Optional[dict]:
+        return self._pending.get(order_id)
+
+    def pending_for_outlet(self, outlet_id: str) -> List[dict]:
+        return [dict(doc) for doc in self._pending.values() if doc.get('outlet_id') == outlet_id]
+
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    async def submit(self, doc: dict) -> None:
+        line = json.dumps(doc, separators=(',', ':')) + "\n"
+        acked = asyncio.get_running_loop().create_future()
+        self._unsynced.append((doc, line, acked))
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_unsynced())
+        await acked
+        if len(self._pending) >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            async with self._wal_lock:
+                await self._rotate()
+            for path in [path for path in self._segments if path != self._segment_path]:
+                order_ids = self._segments[path]
+                while order_ids:
+                    batch = [self._pending[order_id] for order_id in order_ids[:self.max_batch] if order_id in self._pending]
+                    await insert_orders_idempotent([dict(doc) for doc in batch])
+                    for order_id in order_ids[:self.max_batch]:
+                        self._pending.pop(order_id, None)
+                    del order_ids[:self.max_batch]
+                del self._segments[path]
+                async with self._wal_lock:
+                    await run_in_threadpool(path.unlink, missing_ok=True)
+
+    async def ensure_flushed(self, order_id: str) -> None:
+        if order_id in self._pending:
+            await self.flush()
+
+    async def replay(self) -> int:
+        """Load WAL segments into the pending set, then flush them.
+
+        If the flush fails the entries stay pending, so the write-behind
+        task retries them and their segments stay on disk until they land.
+        """
+        self._bind()
+        paths = await run_in_threadpool(self._existing_segments)
+        replayed = 0
+        for path in paths:
+            order_ids = []
+            with open(path, encoding="utf-8") as wal:
+                for line in wal:
+                    try:
+                        doc = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn write from a crash mid-append; it was never acknowledged
+                        logger.warning("Skipping incomplete write-ahead log entry")
+                        continue
+                    # Written before multi-outlet support, and the startup
+                    # migration may run before these reach Mongo
+                    doc.setdefault('outlet_id', DEFAULT_OUTLET_ID)
+                    self._pending[doc['id']] = doc
+                    order_ids.append(doc['id'])
+                    replayed += 1
+            self._segments[path] = order_ids
+        await self.flush()
+        return replayed
+
+    def start(self) -> None:
+        self._bind()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def _bind(self) -> None:
+        # Bound to the running loop, so created here rather than at import
+        if self._flush_lock is None:
+            self._wal_lock = asyncio.Lock()
+            self._flush_lock = asyncio.Lock()
+            self._wakeup = asyncio.Event()
+
+    async def stop(self) -> None:
+        if self._sync_task is not None:
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing orders on shutdown: {e}")
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+        self._wal_lock = None
+        self._flush_lock = None
+        self._wakeup = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # Orders stay pending and in the WAL; retry on the next tick
+                logger.error(f"Error flushing orders: {e}")
+
+    async def _sync_unsynced(self) -> None:
+        while self._unsynced:
+            group, self._unsynced = self._unsynced, []
+            try:
+                async with self._wal_lock:
+                    if self._segment_path is None:
+                        self._segment_path = self._new_segment_path()
+                    await run_in_threadpool(self._write, "".join(line for _, line, _ in group))
+                    # Registered before the lock is released so a rotation
+                    # cannot seal the segment without these orders
+                    order_ids = self._segments.setdefault(self._segment_path, [])
+                    for doc, _, _ in group:
+                        self._pending[doc['id']] = doc
+                        order_ids.append(doc['id'])
+            except Exception as e:
+                for _, _, acked in group:
+                    if not acked.done():
+                        acked.set_exception(e)
+            else:
+                for _, _, acked in group:
+                    if not acked.done():
+                        acked.set_result(None)
+
+    async def _rotate(self) -> None:
+        # Caller holds _wal_lock; the next append opens a fresh segment
+        if self._wal is not None:
+            wal, self._wal = self._wal, None
+            await run_in_threadpool(wal.close)
+        if self._segment_path in self._segments:
+            self._segment_path = self._new_segment_path()
+
+    def _new_segment_path(self) -> Path:
+        path = self.wal_path.with_name(f"{self.wal_path.name}.{self._next_segment}")
+        self._next_segment += 1
+        return path
+
+    def _existing_segments(self) -> List[Path]:
+        """Segment files on disk, oldest first; a bare wal_path predates rotation."""
+        segments = []
+        for path in self.wal_path.parent.glob(f"{self.wal_path.name}.*"):
+            suffix = path.name[len(self.wal_path.name) + 1:]
+            if suffix.isdigit():
+                segments.append((int(suffix), path))
+        segments.sort()
+        if segments:
+            self._next_segment = segments[-1][0] + 1
+        paths = [path for _, path in segments]
+        if self.wal_path.exists():
+            paths.insert(0, self.wal_path)
+        return paths
+
+    def _write(self, data: str) -> None:
+        if self._wal is None:
+            self._wal = open(self._segment_path, "a", encoding="utf-8")
+        self._wal.write(data)
+        self._wal.flush()
+        os.fsync(self._wal.fileno())
+
+order_ingest = OrderWriteBehind(ORDER_WAL_PATH, ORDER_FLUSH_INTERVAL_MS, ORDER_FLUSH_MAX_BATCH)
+
+# Request Profiling
+class RequestProfile:
+    def __init__(self, method: str, path: str, trigger: str, outlet_id: Optional[str] = None):
+        self.id = str(uuid.uuid4())
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.outlet_id = outlet_id
+        self.status_code = None
+        self.started_at = datetime.now(timezone.utc)
+        self.duration_ms = None
+        self.mongo_started = {}
+        self.mongo_calls = []
+        self.emits = []
+        self.stats = None
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "outlet_id": self.outlet_id,
+            "status_code": self.status_code,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "mongo_calls": len(self.mongo_calls),
+            "mongo_ms": sum(call['duration_ms'] for call in self.mongo_calls),
+            "emits": len(self.emits),
+            "emit_ms": sum(emit['duration_ms'] for emit in self.emits),
+        }
+
+    def report(self, sort: str, limit: int) -> dict:
+        report = self.summary()
+        report["mongo"] = self.mongo_calls
+        report["socketio"] = self.emits
+        if self.stats is not None:
+            report["profile_scope"] = PROFILE_SCOPE_NOTE
+            buffer = StringIO()
+            self.stats.stream = buffer
+            self.stats.sort_stats(sort).print_stats(limit)
+            report["profile"] = buffer.getvalue()
+        return report
+
+PROFILE_SCOPE_NOTE = (
+    "cProfile traces the event-loop thread: the stats include every request "
+    "that ran concurrently and omit work done in executor threads (Motor/pymongo). "
+    "Use the mongo timings for database cost."
+)
+
+# Most recent profiles, oldest evicted first
+request_profiles = OrderedDict()
+
+def attribute_profile(outlet_id: str) -> None:
+    """Assign the request being profiled, if any, to an outlet."""
+    profile = current_profile.get()
+    if profile is not None:
+        profile.outlet_id = outlet_id
+
+def store_profile(profile: RequestProfile) -> None:
+    # Admins only see their own outlet's profiles; unattributed ones are dropped
+    if profile.outlet_id is None:
+        return
+    request_profiles[profile.id] = profile
+    while len(request_profiles) > PROFILE_RING_SIZE:
+        request_profiles.popitem(last=False)
+
+class RequestProfilerMiddleware:
+    """Profile single requests on demand.
+
+    A request is profiled when it carries `X-Profile: 1` with the token of
+    an existing admin, or when it is picked by PROFILE_SAMPLE_PERCENT. Only
+    installed when PROFILING_ENABLED is set, so disabled deployments pay
+    nothing. Each profile belongs to an outlet: the admin's, or the one the
+    route attributes it to via attribute_profile().
+
+    cProfile hooks the event-loop thread, not a request: its stats also
+    cover every request running concurrently, and miss Motor's executor
+    threads. So one request is profiled at a time and for at most
+    PROFILE_MAX_SECONDS, and SSE streams and long-polls are never sampled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._busy = False
+
+    async def __call__(self, scope, receive, send):
+        trigger, outlet_id = await self._trigger(scope) if scope['type'] == 'http' and not self._busy else (None, None)
+        if trigger is None or self._busy:
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope['method'], scope['path'], trigger, outlet_id)
+
+        async def send_with_profile_id(message):
+            if message['type'] == 'http.response.start':
+                profile.status_code = message['status']
+                message.setdefault('headers', []).append((b'x-profile-id', profile.id.encode()))
+            await send(message)
+
+        self._busy = True
+        token = current_profile.set(profile)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+
+        def finish():
+            if profile.stats is not None:
+                return
+            profiler.disable()
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            self._busy = False
+            profile.stats = pstats.Stats(profiler)
+            store_profile(profile)
+
+        # Stop a long-running request's profile early so it cannot slow
+        # every other request for its whole lifetime
+        deadline = asyncio.get_running_loop().call_later(PROFILE_MAX_SECONDS, finish)
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            deadline.cancel()
+            current_profile.reset(token)
+            finish()
+
+    async def _trigger(self, scope) -> tuple:
+        """Return (trigger, outlet_id), or (None, None) to skip profiling."""
+        if not scope['path'].startswith('/api/') or scope['path'].startswith('/api/admin/profiles'):
+            return None, None
+        headers = dict(scope['headers'])
+        authorization = headers.get(b'authorization', b'').decode()
+        token = authorization[7:] if authorization.startswith('Bearer ') else None
+        if headers.get(PROFILE_HEADER.encode()) == b'1' and token:
+            # Same checks as the admin routes, so deleted admins cannot profile
+            try:
+                admin = await get_current_admin(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+                return "header", admin.outlet_id
+            except Exception:
+                pass
+        if PROFILE_SAMPLE_PERCENT > 0 and random.random() * 100 < PROFILE_SAMPLE_PERCENT:
+            # Streams and long-polls stay open far longer than their work
+            if scope['path'].endswith('/events') or b'wait' in parse_qs(scope['query_string']):
+                return None, None
+            payload = decode_jwt_token(token) if token else None
+            return "sample", payload.get('outlet_id') if payload else None
+        return None, None
+
+if PROFILING_ENABLED:
+    app.add_middleware(RequestProfilerMiddleware)
 
 # Socket.IO events
 @sio.event
@@ -269,9 +1536,23 @@ async def join_order_room(sid, data):
         logger.info(f"Client {sid} joined room order_{order_id}")
 
 @sio.event
-async def join_admin_room(sid):
-    await sio.enter_room(sid, "admin")
-    logger.info(f"Admin {sid} joined admin room")
+async def join_menu_room(sid, data):
+    outlet_id = (data or {}).get('outlet_id') or DEFAULT_OUTLET_ID
+    if not isinstance(outlet_id, str) or not await is_known_outlet(outlet_id):
+        logger.warning(f"Client {sid} tried to join menu room of unknown outlet {outlet_id!r}")
+        return
+    await sio.enter_room(sid, menu_room(outlet_id))
+    logger.info(f"Client {sid} joined room {menu_room(outlet_id)}")
+
+@sio.event
+async def join_admin_room(sid, data=None):
+    payload = decode_jwt_token((data or {}).get('token', ''))
+    if payload is None:
+        logger.warning(f"Client {sid} tried to join admin room without a valid token")
+        return
+    room = admin_room(payload.get('outlet_id', DEFAULT_OUTLET_ID))
+    await sio.enter_room(sid, room)
+    logger.info(f"Admin {sid} joined room {room}")
 
 # Auth Routes
 @api_router.post("/auth/login", response_model=LoginResponse)
@@ -290,8 +1571,9 @@ async def login(request: LoginRequest):
                 detail="Invalid username or password"
             )
         
-        token = create_jwt_token(request.username)
-        return LoginResponse(token=token, username=request.username)
+        outlet_id = user.get('outlet_id', DEFAULT_OUTLET_ID)
+        token = create_jwt_token(request.username, outlet_id)
+        return LoginResponse(token=token, username=request.username, outlet_id=outlet_id)
     except HTTPException:
         raise
     except Exception as e:
@@ -299,26 +1581,34 @@ async def login(request: LoginRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/auth/verify")
-async def verify_token(username: str = Depends(get_current_user)):
-    return {"valid": True, "username": username}
+async def verify_token(admin: AdminContext = Depends(get_current_admin)):
+    return {"valid": True, "username": admin.username, "outlet_id": admin.outlet_id}
 
 # Menu Routes
 @api_router.get("/menu", response_model=List[MenuItem])
-async def get_menu():
+async def get_menu(outlet_id: str = DEFAULT_OUTLET_ID):
     try:
-        items = await db.menu_items.find({"available": True}, {"_id": 0}).to_list(1000)
+        await require_outlet(outlet_id)
+        attribute_profile(outlet_id)
+        items = menu_cache.get(outlet_id)
+        if items is not None:
+            return items
+        items = await db.menu_items.find({"outlet_id": outlet_id, "available": True}, {"_id": 0}).to_list(1000)
         for item in items:
             if isinstance(item['created_at'], str):
                 item['created_at'] = datetime.fromisoformat(item['created_at'])
+        menu_cache.set(outlet_id, items)
         return items
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching menu: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/menu/all", response_model=List[MenuItem])
-async def get_all_menu(username: str = Depends(get_current_user)):
+async def get_all_menu(admin: AdminContext = Depends(get_current_admin)):
     try:
-        items = await db.menu_items.find({}, {"_id": 0}).to_list(1000)
+        items = await db.menu_items.find({"outlet_id": admin.outlet_id}, {"_id": 0}).to_list(1000)
         for item in items:
             if isinstance(item['created_at'], str):
                 item['created_at'] = datetime.fromisoformat(item['created_at'])
@@ -328,29 +1618,134 @@ async def get_all_menu(username: str = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/menu", response_model=MenuItem)
-async def create_menu_item(item: MenuItemCreate, username: str = Depends(get_current_user)):
+async def create_menu_item(item: MenuItemCreate, admin: AdminContext = Depends(get_current_admin)):
     try:
-        menu_item = MenuItem(**item.model_dump())
+        menu_item = MenuItem(**item.model_dump(), outlet_id=admin.outlet_id)
         doc = menu_item.model_dump()
         doc['created_at'] = doc['created_at'].isoformat()
         await db.menu_items.insert_one(doc)
+        menu_cache.invalidate(admin.outlet_id)
         return menu_item
     except Exception as e:
         logger.error(f"Error creating menu item: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/menu:bulk")
+async def bulk_upsert_menu_items(request: Request, admin: AdminContext = Depends(get_current_admin)):
+    """Create or update many menu items in one ordered bulk_write.
+
+    Rows with an `id` update that item. Rows without one are matched by
+    `name` within the outlet and updated, or created if no item has that
+    name. Every row is validated before anything is written.
+    """
+    rows = parse_bulk_menu_rows(await request.body(), request.headers.get("content-type", ""))
+    if not rows:
+        raise HTTPException(status_code=400, detail="No menu items given")
+    if len(rows) > MENU_BULK_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {MENU_BULK_MAX_ROWS} rows per request")
+    
+    try:
+        # One lookup resolves every id and name referenced by the batch
+        ids = [row['id'] for row in rows if isinstance(row.get('id'), str)]
+        names = [row['name'] for row in rows if not row.get('id') and isinstance(row.get('name'), str)]
+        existing = await db.menu_items.find(
+            {"outlet_id": admin.outlet_id, "$or": [{"id": {"$in": ids}}, {"name": {"$in": names}}]},
+            {"_id": 0, "id": 1, "name": 1}
+        ).to_list(None)
+    except Exception as e:
+        logger.error(f"Error resolving bulk menu items: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    known_ids = {item['id'] for item in existing}
+    ids_by_name = {item['name']: item['id'] for item in existing}
+    
+    operations = []
+    results = []
+    errors = []
+    seen = set()
+    for row_number, row in enumerate(rows, start=1):
+        # Keys must be checked before they are hashed below
+        key_errors = [
+            f"{field}: Input should be a valid string"
+            for field in ('id', 'name')
+            if row.get(field) is not None and not isinstance(row[field], str)
+        ]
+        if key_errors:
+            errors.append({"row": row_number, "errors": key_errors})
+            continue
+        fields = {k: v for k, v in row.items() if k != 'id'}
+        item_id = row.get('id') or ids_by_name.get(row.get('name'))
+        key = item_id or row.get('name')
+        if key is not None and key in seen:
+            errors.append({"row": row_number, "errors": ["duplicate of an earlier row"]})
+            continue
+        seen.add(key)
+        
+        if row.get('id') and row['id'] not in known_ids:
+            errors.append({"row": row_number, "errors": ["Menu item not found"]})
+            continue
+        try:
+            if item_id:
+                if not row.get('id'):
+                    # Matched by name: the name is the key, not a change
+                    fields.pop('name', None)
+                update_data = menu_update_fields(MenuItemUpdate(**fields))
+                if update_data:
+                    operations.append(UpdateOne(
+                        {"id": item_id, "outlet_id": admin.outlet_id},
+                        {"$set": update_data}
+                    ))
+                results.append({"row": row_number, "id": item_id, "action": "updated" if update_data else "unchanged"})
+            else:
+                menu_item = MenuItem(**MenuItemCreate(**fields).model_dump(), outlet_id=admin.outlet_id)
+                doc = menu_item.model_dump()
+                doc['created_at'] = doc['created_at'].isoformat()
+                operations.append(InsertOne(doc))
+                results.append({"row": row_number, "id": menu_item.id, "action": "created"})
+        except ValidationError as e:
+            errors.append({"row": row_number, "errors": format_validation_errors(e)})
+    
+    if errors:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+    
+    try:
+        if operations:
+            await db.menu_items.bulk_write(operations, ordered=True)
+    except BulkWriteError as e:
+        logger.error(f"Error applying bulk menu changes: {e.details}")
+        raise HTTPException(status_code=500, detail=f"Bulk write stopped after {e.details.get('nInserted', 0) + e.details.get('nModified', 0)} changes")
+    except Exception as e:
+        logger.error(f"Error applying bulk menu changes: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if operations:
+            menu_cache.invalidate(admin.outlet_id)
+    
+    return {
+        "created": sum(1 for result in results if result['action'] == "created"),
+        "updated": sum(1 for result in results if result['action'] == "updated"),
+        "unchanged": sum(1 for result in results if result['action'] == "unchanged"),
+        "results": results
+    }
+
 @api_router.put("/menu/{item_id}", response_model=MenuItem)
-async def update_menu_item(item_id: str, item: MenuItemUpdate, username: str = Depends(get_current_user)):
+async def update_menu_item(item_id: str, item: MenuItemUpdate, admin: AdminContext = Depends(get_current_admin)):
     try:
-        existing = await db.menu_items.find_one({"id": item_id}, {"_id": 0})
-        if not existing:
+        item_filter = {"id": item_id, "outlet_id": admin.outlet_id}
+        update_data = menu_update_fields(item)
+        if update_data:
+            updated = await db.menu_items.find_one_and_update(
+                item_filter,
+                {"$set": update_data},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+        else:
+            updated = await db.menu_items.find_one(item_filter, {"_id": 0})
+        if not updated:
             raise HTTPException(status_code=404, detail="Menu item not found")
-        
-        update_data = {k: v for k, v in item.model_dump().items() if v is not None}
         if update_data:
-            await db.menu_items.update_one({"id": item_id}, {"$set": update_data})
+            menu_cache.invalidate(admin.outlet_id)
         
-        updated = await db.menu_items.find_one({"id": item_id}, {"_id": 0})
         if isinstance(updated['created_at'], str):
             updated['created_at'] = datetime.fromisoformat(updated['created_at'])
         return MenuItem(**updated)
@@ -361,11 +1756,12 @@ async def update_menu_item(item_id: str, item: MenuItemUpdate, username: str = D
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.delete("/menu/{item_id}")
-async def delete_menu_item(item_id: str, username: str = Depends(get_current_user)):
+async def delete_menu_item(item_id: str, admin: AdminContext = Depends(get_current_admin)):
     try:
-        result = await db.menu_items.delete_one({"id": item_id})
+        result = await db.menu_items.delete_one({"id": item_id, "outlet_id": admin.outlet_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Menu item not found")
+        menu_cache.invalidate(admin.outlet_id)
         return {"message": "Menu item deleted successfully"}
     except HTTPException:
         raise
@@ -383,30 +1779,195 @@ async def create_order(order_request: OrderCreate):
         doc['created_at'] = doc['created_at'].isoformat()
         doc['updated_at'] = doc['updated_at'].isoformat()
         
-        # Insert dengan _id yang akan di-exclude
-        result = await db.orders.insert_one(doc)
+        # Salinan tanpa _id untuk Socket.IO (insert_one menambahkan _id ke doc)
+        clean_doc = dict(doc)
+        
+        await require_outlet(order.outlet_id)
+        attribute_profile(order.outlet_id)
+        remaining_stock = await reserve_stock(order.outlet_id, order.items)
+        try:
+            if ORDER_WRITE_BEHIND:
+                await order_ingest.submit(doc)
+            else:
+                await db.orders.insert_one(doc)
+        except Exception:
+            reserved = defaultdict(int)
+            for item in order.items:
+                if item.menu_item_id in remaining_stock:
+                    reserved[item.menu_item_id] += item.quantity
+            await release_stock(order.outlet_id, reserved)
+            raise
+        order_events.remember(clean_doc)
         logger.info(f"Order created successfully: {order.id}")
         
-        # ✅ PERBAIKAN: Fetch kembali tanpa _id untuk Socket.IO
-        clean_doc = await db.orders.find_one({"id": order.id}, {"_id": 0})
+        await mark_sold_out(order.outlet_id, [item_id for item_id, stock in remaining_stock.items() if stock == 0])
         
         # Emit to admin room
         try:
-            await sio.emit('new_order', clean_doc, room='admin')
+            await sio.emit('new_order', clean_doc, room=admin_room(order.outlet_id))
         except Exception as e:
             logger.error(f"Error emitting socket event: {e}")
         
+        columns = order_columns.get(order.outlet_id)
+        if columns is not None:
+            columns.add(clean_doc)
+        
+        queue = get_kitchen_queue(order.outlet_id)
+        await emit_queue_updates(queue, queue.add(doc))
+        
         return order
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating order: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/orders/export")
+async def export_orders(
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    format: str = "csv",
+    rows: str = "item",
+    admin: AdminContext = Depends(get_current_admin)
+):
+    if format not in ("csv", "parquet"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'parquet'")
+    if rows not in ("item", "order"):
+        raise HTTPException(status_code=400, detail="rows must be 'item' or 'order'")
+    if format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    
+    created_range = {}
+    start = parse_export_bound(from_, "from")
+    end = parse_export_bound(to, "to", end=True)
+    if start:
+        created_range["$gte"] = start
+    if end:
+        created_range["$lt"] = end
+    query = {"outlet_id": admin.outlet_id}
+    if created_range:
+        query["created_at"] = created_range
+    
+    columns = ITEM_EXPORT_COLUMNS if rows == "item" else ORDER_EXPORT_COLUMNS
+    filename = f"orders_{from_ or 'all'}_{to or 'now'}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format == "csv":
+        return StreamingResponse(
+            stream_orders_csv(query, rows, columns),
+            media_type="text/csv; charset=utf-8",
+            headers=headers
+        )
+    return StreamingResponse(
+        stream_orders_parquet(query, rows, columns),
+        media_type="application/vnd.apache.parquet",
+        headers=headers
+    )
+
+async def wait_for_order_change(order_id: str, since: str, wait: float) -> Optional[dict]:
+    """Return the order once its updated_at is newer than `since`, or None on timeout."""
+    try:
+        # '+' in an unencoded offset arrives as a space
+        since_at = parse_datetime(since.replace(' ', '+'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid 'since' timestamp: {since}")
+    if since_at.tzinfo is None:
+        since_at = since_at.replace(tzinfo=timezone.utc)
+    
+    # Subscribe before reading so an update in between is not missed
+    subscription = order_events.subscribe(order_id)
+    try:
+        order = await load_order_snapshot(order_id)
+        if order is None:
+            raise HTTPException(status_code=404, detail="Order not found")
+        if parse_datetime(order['updated_at']) > since_at:
+            return order
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                event, _ = await asyncio.wait_for(subscription.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return None
+            if event == 'order_status_updated':
+                return await load_order_snapshot(order_id)
+    finally:
+        order_events.unsubscribe(order_id, subscription)
+
+@api_router.get("/orders/{order_id}/events")
+async def stream_order_events(order_id: str):
+    # Subscribe before reading so an update in between is not missed
+    subscription = order_events.subscribe(order_id)
+    try:
+        order = await load_order_snapshot(order_id)
+        if order is None:
+            raise HTTPException(status_code=404, detail="Order not found")
+        attribute_profile(order.get('outlet_id', DEFAULT_OUTLET_ID))
+    except HTTPException:
+        order_events.unsubscribe(order_id, subscription)
+        raise
+    except Exception as e:
+        order_events.unsubscribe(order_id, subscription)
+        logger.error(f"Error opening order event stream: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def event_stream():
+        try:
+            yield format_sse('order_status_updated', {
+                "order_id": order_id,
+                "status": order['status'],
+                "updated_at": order['updated_at']
+            })
+            queue_status = find_queue_status(order_id)
+            if queue_status is not None:
+                queue_status['estimated_ready_at'] = queue_status['estimated_ready_at'].isoformat()
+                yield format_sse('queue_position_updated', queue_status)
+            if order['status'] not in ACTIVE_ORDER_STATUSES:
+                return
+            
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(
+                        subscription.get(), timeout=ORDER_SSE_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event, data)
+                if event == 'order_status_updated' and data['status'] not in ACTIVE_ORDER_STATUSES:
+                    return
+        finally:
+            order_events.unsubscribe(order_id, subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/orders/{order_id}", response_model=Order)
-async def get_order(order_id: str):
+async def get_order(order_id: str, wait: Optional[float] = None, since: Optional[str] = None):
     try:
-        order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+        order = None
+        if wait and since:
+            order = await wait_for_order_change(order_id, since, min(wait, ORDER_LONG_POLL_MAX_SECONDS))
+            if order is None:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED)
+        
+        if order is None:
+            order = order_ingest.get_pending(order_id)
+        if order is None:
+            order = await db.orders.find_one({"id": order_id}, {"_id": 0})
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
+        order = dict(order)
+        attribute_profile(order.get('outlet_id', DEFAULT_OUTLET_ID))
         
         if isinstance(order['created_at'], str):
             order['created_at'] = datetime.fromisoformat(order['created_at'])
@@ -420,10 +1981,35 @@ async def get_order(order_id: str):
         logger.error(f"Error fetching order: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/orders/{order_id}/queue", response_model=QueueStatus)
+async def get_order_queue(order_id: str):
+    try:
+        queue_status = find_queue_status(order_id)
+        if queue_status is not None:
+            return QueueStatus(**queue_status)
+        
+        # Not queued: either finished/cancelled or unknown
+        order = await db.orders.find_one({"id": order_id}, {"_id": 0, "status": 1})
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        return QueueStatus(order_id=order_id, status=order['status'])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching order queue: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/orders", response_model=List[Order])
-async def get_orders(username: str = Depends(get_current_user)):
+async def get_orders(admin: AdminContext = Depends(get_current_admin)):
     try:
-        orders = await db.orders.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+        orders = await db.orders.find({"outlet_id": admin.outlet_id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+        # Acknowledged orders still waiting for the write-behind flush
+        pending = order_ingest.pending_for_outlet(admin.outlet_id)
+        if pending:
+            stored_ids = {order['id'] for order in orders}
+            orders.extend(order for order in pending if order['id'] not in stored_ids)
+            orders.sort(key=lambda order: order['created_at'], reverse=True)
+            del orders[1000:]
         for order in orders:
             if isinstance(order['created_at'], str):
                 order['created_at'] = datetime.fromisoformat(order['created_at'])
@@ -435,17 +2021,24 @@ async def get_orders(username: str = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.put("/orders/{order_id}/status", response_model=Order)
-async def update_order_status(order_id: str, status_update: OrderStatusUpdate, username: str = Depends(get_current_user)):
+async def update_order_status(order_id: str, status_update: OrderStatusUpdate, admin: AdminContext = Depends(get_current_admin)):
     try:
-        order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+        await order_ingest.ensure_flushed(order_id)
+        order = await db.orders.find_one({"id": order_id, "outlet_id": admin.outlet_id}, {"_id": 0})
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         
-        updated_at = datetime.now(timezone.utc).isoformat()
+        now = datetime.now(timezone.utc)
+        updated_at = now.isoformat()
         await db.orders.update_one(
             {"id": order_id},
             {"$set": {"status": status_update.status, "updated_at": updated_at}}
         )
+        columns = order_columns.get(admin.outlet_id)
+        if columns is not None:
+            columns.update_status(order_id, status_update.status)
+        queue = get_kitchen_queue(admin.outlet_id)
+        queue_changes = queue.update_status(order, status_update.status, now)
         
         # ✅ PERBAIKAN: Gunakan dict biasa, bukan ObjectId
         update_data = {
@@ -453,14 +2046,18 @@ async def update_order_status(order_id: str, status_update: OrderStatusUpdate, u
             "status": status_update.status,
             "updated_at": updated_at
         }
+        order_events.remember({**order, "status": status_update.status, "updated_at": updated_at})
+        order_events.publish(order_id, 'order_status_updated', update_data)
         
         # Emit to specific order room and admin room
         try:
             await sio.emit('order_status_updated', update_data, room=f"order_{order_id}")
-            await sio.emit('order_updated', update_data, room='admin')
+            await sio.emit('order_updated', update_data, room=admin_room(admin.outlet_id))
         except Exception as e:
             logger.error(f"Error emitting socket event: {e}")
         
+        await emit_queue_updates(queue, queue_changes)
+        
         updated_order = await db.orders.find_one({"id": order_id}, {"_id": 0})
         if isinstance(updated_order['created_at'], str):
             updated_order['created_at'] = datetime.fromisoformat(updated_order['created_at'])
@@ -476,14 +2073,22 @@ async def update_order_status(order_id: str, status_update: OrderStatusUpdate, u
 
 # Analytics Routes
 @api_router.get("/analytics/daily")
-async def get_daily_analytics(username: str = Depends(get_current_user)):
+async def get_daily_analytics(admin: AdminContext = Depends(get_current_admin)):
     try:
         today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
         
         orders = await db.orders.find({
+            "outlet_id": admin.outlet_id,
             "created_at": {"$gte": today_start.isoformat()},
             "status": {"$ne": "cancelled"}
         }, {"_id": 0}).to_list(1000)
+        stored_ids = {order['id'] for order in orders}
+        orders.extend(
+            order for order in order_ingest.pending_for_outlet(admin.outlet_id)
+            if order['id'] not in stored_ids
+            and order['created_at'] >= today_start.isoformat()
+            and order['status'] != "cancelled"
+        )
         
         total_orders = len(orders)
         total_revenue = sum(order['total'] for order in orders)
@@ -497,11 +2102,44 @@ async def get_daily_analytics(username: str = Depends(get_current_user)):
         logger.error(f"Error fetching analytics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/analytics/heatmap")
+async def get_heatmap_analytics(
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    utc_offset: float = ANALYTICS_UTC_OFFSET_HOURS,
+    admin: AdminContext = Depends(get_current_admin)
+):
+    start_ts, end_ts = parse_analytics_range(from_, to)
+    try:
+        columns = await get_order_columns(admin.outlet_id)
+        return columns.heatmap(start_ts, end_ts, utc_offset)
+    except Exception as e:
+        logger.error(f"Error computing heatmap: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/analytics/basket")
+async def get_basket_analytics(
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    min_orders: int = Query(2, ge=1),
+    admin: AdminContext = Depends(get_current_admin)
+):
+    start_ts, end_ts = parse_analytics_range(from_, to)
+    try:
+        columns = await get_order_columns(admin.outlet_id)
+        return columns.basket(start_ts, end_ts, limit, min_orders)
+    except Exception as e:
+        logger.error(f"Error computing basket pairs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # QR Code Generation
 @api_router.get("/qrcode")
-async def generate_qr_code():
+async def generate_qr_code(admin: AdminContext = Depends(get_current_admin)):
     try:
         frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+        # Customers scanning the QR land on this outlet's menu
+        outlet_url = f"{frontend_url.rstrip('/')}/?{urlencode({'outlet': admin.outlet_id})}"
         
         qr = qrcode.QRCode(
             version=1,
@@ -509,7 +2147,7 @@ async def generate_qr_code():
             box_size=10,
             border=4,
         )
-        qr.add_data(frontend_url)
+        qr.add_data(outlet_url)
         qr.make(fit=True)
         
         img = qr.make_image(fill_color="black", back_color="white")
@@ -518,11 +2156,31 @@ async def generate_qr_code():
         img.save(buffered, format="PNG")
         img_str = base64.b64encode(buffered.getvalue()).decode()
         
-        return {"qr_code": f"data:image/png;base64,{img_str}"}
+        return {"qr_code": f"data:image/png;base64,{img_str}", "url": outlet_url}
     except Exception as e:
         logger.error(f"Error generating QR code: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Profiling Routes
+@api_router.get("/admin/profiles")
+async def list_profiles(admin: AdminContext = Depends(get_current_admin)):
+    return [
+        profile.summary() for profile in reversed(request_profiles.values())
+        if profile.outlet_id == admin.outlet_id
+    ]
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls|ncalls)$"),
+    limit: int = Query(40, ge=1, le=500),
+    admin: AdminContext = Depends(get_current_admin)
+):
+    profile = request_profiles.get(profile_id)
+    if profile is None or profile.outlet_id != admin.outlet_id:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.report(sort, limit)
+
 # Include router
 app.include_router(api_router)
 
@@ -75,6 +75,7 @@ class WarkopMametAPITester:
         if success and 'token' in response:
             self.token = response['token']
             print(f"   Token obtained: {self.token[:20]}...")
+            print(f"   Outlet: {response.get('outlet_id')}")
             return True
         return False
 
@@ -104,6 +105,16 @@ class WarkopMametAPITester:
         
         print(f"   Found {len(menu_data)} menu items")
         
+        # Get public menu for a specific outlet
+        success, outlet_menu_data = self.run_test(
+            "Get Outlet Menu",
+            "GET",
+            "menu?outlet_id=main",
+            200
+        )
+        if not success:
+            return False
+        
         # Get all menu (admin)
         success, all_menu_data = self.run_test(
             "Get All Menu (Admin)",
@@ -121,7 +132,8 @@ class WarkopMametAPITester:
             "price": 15000,
             "image_url": "https://images.unsplash.com/photo-1461023058943-07fcbe16d735?w=400",
             "description": "Test kopi susu untuk testing",
-            "available": True
+            "available": True,
+            "stock": 10
         }
         
         success, created_item = self.run_test(
@@ -139,7 +151,8 @@ class WarkopMametAPITester:
         if self.created_menu_item_id:
             update_data = {
                 "name": "Updated Test Kopi Susu",
-                "price": 16000
+                "price": 16000,
+                "stock": 5
             }
             success, updated_item = self.run_test(
                 "Update Menu Item",
@@ -149,31 +162,55 @@ class WarkopMametAPITester:
                 data=update_data
             )
         
+        # Bulk upsert menu items
+        if self.created_menu_item_id:
+            success, bulk_result = self.run_test(
+                "Bulk Update Menu Items",
+                "POST",
+                "menu:bulk",
+                200,
+                data=[{"id": self.created_menu_item_id, "price": 17000}]
+            )
+            if success:
+                print(f"   Bulk result: {bulk_result.get('updated')} updated")
+        
         return True
 
     def test_order_operations(self):
         """Test order operations"""
         print("\n=== TESTING ORDER OPERATIONS ===")
         
+        # Orders may only contain items from the outlet's menu
+        success, menu_data = self.run_test(
+            "Get Menu For Order",
+            "GET",
+            "menu",
+            200
+        )
+        if not success or len(menu_data) < 2:
+            print("❌ Need at least two menu items to create an order")
+            return False
+        first_item, second_item = menu_data[0], menu_data[1]
+        
         # Create order
         order_data = {
             "customer_name": "Test Customer",
             "table_number": "Meja 5",
             "items": [
                 {
-                    "menu_item_id": "test-item-1",
-                    "name": "Kopi Hitam",
-                    "price": 10000,
+                    "menu_item_id": first_item['id'],
+                    "name": first_item['name'],
+                    "price": first_item['price'],
                     "quantity": 2
                 },
                 {
-                    "menu_item_id": "test-item-2", 
-                    "name": "Nasi Goreng",
-                    "price": 15000,
+                    "menu_item_id": second_item['id'],
+                    "name": second_item['name'],
+                    "price": second_item['price'],
                     "quantity": 1
                 }
             ],
-            "total": 35000
+            "total": first_item['price'] * 2 + second_item['price']
         }
         
         success, created_order = self.run_test(
@@ -196,6 +233,26 @@ class WarkopMametAPITester:
                 200
             )
         
+        # Get queue position and ETA
+        if self.created_order_id:
+            success, queue_data = self.run_test(
+                "Get Order Queue Position",
+                "GET",
+                f"orders/{self.created_order_id}/queue",
+                200
+            )
+            if success:
+                print(f"   Queue position: {queue_data.get('position')}, ETA: {queue_data.get('eta_seconds')}s")
+        
+        # Long-poll for a status change that does not happen
+        if self.created_order_id:
+            success, _ = self.run_test(
+                "Long-poll Order Status (Not Modified)",
+                "GET",
+                f"orders/{self.created_order_id}?wait=1&since={created_order['updated_at']}",
+                304
+            )
+        
         # Get all orders (admin)
         success, all_orders = self.run_test(
             "Get All Orders (Admin)",
@@ -219,6 +276,27 @@ class WarkopMametAPITester:
         
         return True
 
+    def test_order_export(self):
+        """Test order export for accounting"""
+        print("\n=== TESTING ORDER EXPORT ===")
+        
+        success, _ = self.run_test(
+            "Export Orders CSV",
+            "GET",
+            "orders/export?format=csv&rows=item",
+            200
+        )
+        if not success:
+            return False
+        
+        success, _ = self.run_test(
+            "Export Orders Parquet",
+            "GET",
+            "orders/export?format=parquet&rows=order",
+            200
+        )
+        return success
+
     def test_analytics(self):
         """Test analytics endpoint"""
         print("\n=== TESTING ANALYTICS ===")
@@ -231,6 +309,28 @@ class WarkopMametAPITester:
         )
         if success:
             print(f"   Analytics: {analytics_data}")
+        else:
+            return False
+        
+        success, heatmap_data = self.run_test(
+            "Get Peak-hour Heatmap",
+            "GET",
+            "analytics/heatmap",
+            200
+        )
+        if success:
+            print(f"   Average ticket: {heatmap_data.get('average_ticket')}")
+        else:
+            return False
+        
+        success, basket_data = self.run_test(
+            "Get Basket Pairs",
+            "GET",
+            "analytics/basket?limit=5",
+            200
+        )
+        if success:
+            print(f"   Found {len(basket_data.get('pairs', []))} item pairs")
         
         return success
 
@@ -249,6 +349,21 @@ class WarkopMametAPITester:
         
         return success
 
+    def test_profiles(self):
+        """Test request profile listing (empty unless PROFILING_ENABLED)"""
+        print("\n=== TESTING REQUEST PROFILES ===")
+        
+        success, profiles = self.run_test(
+            "List Request Profiles",
+            "GET",
+            "admin/profiles",
+            200
+        )
+        if success:
+            print(f"   Stored profiles: {len(profiles)}")
+        
+        return success
+
     def cleanup(self):
         """Clean up test data"""
         print("\n=== CLEANUP ===")
@@ -274,8 +389,10 @@ def main():
         ("Token Verification", tester.test_token_verification),
         ("Menu Operations", tester.test_menu_operations),
         ("Order Operations", tester.test_order_operations),
+        ("Order Export", tester.test_order_export),
         ("Analytics", tester.test_analytics),
         ("QR Code Generation", tester.test_qr_code),
+        ("Request Profiles", tester.test_profiles),
     ]
     
     failed_tests = []
@@ -60,7 +60,8 @@ const AdminDashboard = () => {
     // Saat socket terhubung
     newSocket.on('connect', () => {
       console.log('Admin connected to WebSocket');
-      newSocket.emit('join_admin_room'); // Bergabung ke "ruangan admin"
+      // Bergabung ke ruangan admin milik outlet pada token
+      newSocket.emit('join_admin_room', { token: localStorage.getItem('admin_token') });
     });
 
     // Ketika ada pesanan baru masuk, muat ulang data pesanan dan analitik
@@ -158,6 +159,7 @@ const AdminDashboard = () => {
   const handleLogout = () => {
     localStorage.removeItem('admin_token');
     localStorage.removeItem('admin_username');
+    localStorage.removeItem('admin_outlet_id');
     toast.success('Logout berhasil');
     navigate('/admin/login');
   };
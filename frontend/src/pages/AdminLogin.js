@@ -37,6 +37,7 @@ const AdminLogin = () => {
 
       localStorage.setItem('admin_token', response.data.token);
       localStorage.setItem('admin_username', response.data.username);
+      localStorage.setItem('admin_outlet_id', response.data.outlet_id);
       toast.success('Login berhasil!');
       navigate('/admin/dashboard');
     } catch (error) {
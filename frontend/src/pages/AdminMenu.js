@@ -8,7 +8,7 @@ import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card'
 import { Badge } from '../components/ui/badge';
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogTrigger } from '../components/ui/dialog';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '../components/ui/select';
-import { ArrowLeft, Plus, Pencil, Trash2, Coffee } from 'lucide-react';
+import { ArrowLeft, Plus, Pencil, Trash2, Coffee, Upload } from 'lucide-react';
 import { toast } from 'sonner';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -27,6 +27,7 @@ const AdminMenu = () => {
     image_url: '',
     description: '',
     available: true,
+    stock: '',
   });
 
   useEffect(() => {
@@ -72,6 +73,7 @@ const AdminMenu = () => {
         image_url: item.image_url,
         description: item.description,
         available: item.available,
+        stock: item.stock ?? '',
       });
     } else {
       setEditingItem(null);
@@ -82,6 +84,7 @@ const AdminMenu = () => {
         image_url: '',
         description: '',
         available: true,
+        stock: '',
       });
     }
     setIsDialogOpen(true);
@@ -98,6 +101,8 @@ const AdminMenu = () => {
     const data = {
       ...formData,
       price: parseFloat(formData.price),
+      // Stok kosong = tidak dilacak
+      stock: formData.stock === '' ? null : parseInt(formData.stock, 10),
     };
 
     try {
@@ -116,6 +121,33 @@ const AdminMenu = () => {
     }
   };
 
+  // Impor CSV: satu request untuk banyak menu (kunci: id atau nama)
+  const handleImportCsv = async (e) => {
+    const file = e.target.files[0];
+    e.target.value = '';
+    if (!file) {
+      return;
+    }
+
+    try {
+      const csv = await file.text();
+      const response = await axios.post(`${API}/menu:bulk`, csv, {
+        headers: { ...getAuthHeaders().headers, 'Content-Type': 'text/csv' },
+      });
+      const { created, updated } = response.data;
+      toast.success(`Impor selesai: ${created} ditambahkan, ${updated} diperbarui`);
+      fetchMenuItems();
+    } catch (error) {
+      console.error('Error importing menu CSV:', error);
+      const detail = error.response?.data?.detail;
+      if (Array.isArray(detail) && detail.length > 0) {
+        toast.error(`Baris ${detail[0].row}: ${detail[0].errors.join(', ')}`);
+      } else {
+        toast.error('Gagal mengimpor menu');
+      }
+    }
+  };
+
   const handleDelete = async (itemId) => {
     if (!window.confirm('Apakah Anda yakin ingin menghapus item ini?')) {
       return;
@@ -150,69 +182,92 @@ const AdminMenu = () => {
                 </div>
               </div>
             </div>
-            <Dialog open={isDialogOpen} onOpenChange={setIsDialogOpen}>
-              <DialogTrigger asChild>
-                <Button data-testid="add-menu-item-btn" onClick={() => handleOpenDialog()} className="bg-amber-600 hover:bg-amber-700">
-                  <Plus className="w-4 h-4 mr-2" />
-                  Tambah Menu
-                </Button>
-              </DialogTrigger>
-              <DialogContent className="max-w-2xl max-h-[90vh] overflow-y-auto">
-                <DialogHeader>
-                  <DialogTitle>{editingItem ? 'Edit Menu' : 'Tambah Menu Baru'}</DialogTitle>
-                </DialogHeader>
-                <form onSubmit={handleSubmit} className="space-y-4 mt-4">
-                  <div>
-                    <Label htmlFor="name">Nama Menu</Label>
-                    <Input id="name" data-testid="menu-name-input" value={formData.name} onChange={(e) => setFormData({ ...formData, name: e.target.value })} required />
-                  </div>
+            <div className="flex items-center gap-2">
+              <input id="import-csv" data-testid="import-menu-csv-input" type="file" accept=".csv,text/csv" onChange={handleImportCsv} className="hidden" />
+              <Button data-testid="import-menu-csv-btn" variant="outline" className="border-amber-300 hover:bg-amber-50" onClick={() => document.getElementById('import-csv').click()}>
+                <Upload className="w-4 h-4 mr-2" />
+                Impor CSV
+              </Button>
+              <Dialog open={isDialogOpen} onOpenChange={setIsDialogOpen}>
+                <DialogTrigger asChild>
+                  <Button data-testid="add-menu-item-btn" onClick={() => handleOpenDialog()} className="bg-amber-600 hover:bg-amber-700">
+                    <Plus className="w-4 h-4 mr-2" />
+                    Tambah Menu
+                  </Button>
+                </DialogTrigger>
+                <DialogContent className="max-w-2xl max-h-[90vh] overflow-y-auto">
+                  <DialogHeader>
+                    <DialogTitle>{editingItem ? 'Edit Menu' : 'Tambah Menu Baru'}</DialogTitle>
+                  </DialogHeader>
+                  <form onSubmit={handleSubmit} className="space-y-4 mt-4">
+                    <div>
+                      <Label htmlFor="name">Nama Menu</Label>
+                      <Input id="name" data-testid="menu-name-input" value={formData.name} onChange={(e) => setFormData({ ...formData, name: e.target.value })} required />
+                    </div>
 
-                  <div>
-                    <Label htmlFor="category">Kategori</Label>
-                    <Select value={formData.category} onValueChange={(value) => setFormData({ ...formData, category: value })}>
-                      <SelectTrigger data-testid="menu-category-select">
-                        <SelectValue />
-                      </SelectTrigger>
-                      <SelectContent>
-                        <SelectItem value="food">Makanan</SelectItem>
-                        <SelectItem value="drink">Minuman</SelectItem>
-                      </SelectContent>
-                    </Select>
-                  </div>
+                    <div>
+                      <Label htmlFor="category">Kategori</Label>
+                      <Select value={formData.category} onValueChange={(value) => setFormData({ ...formData, category: value })}>
+                        <SelectTrigger data-testid="menu-category-select">
+                          <SelectValue />
+                        </SelectTrigger>
+                        <SelectContent>
+                          <SelectItem value="food">Makanan</SelectItem>
+                          <SelectItem value="drink">Minuman</SelectItem>
+                        </SelectContent>
+                      </Select>
+                    </div>
 
-                  <div>
-                    <Label htmlFor="price">Harga (Rp)</Label>
-                    <Input id="price" data-testid="menu-price-input" type="number" value={formData.price} onChange={(e) => setFormData({ ...formData, price: e.target.value })} required />
-                  </div>
+                    <div>
+                      <Label htmlFor="price">Harga (Rp)</Label>
+                      <Input id="price" data-testid="menu-price-input" type="number" value={formData.price} onChange={(e) => setFormData({ ...formData, price: e.target.value })} required />
+                    </div>
 
-                  <div>
-                    <Label htmlFor="image_url">URL Gambar</Label>
-                    <Input id="image_url" data-testid="menu-image-input" type="url" value={formData.image_url} onChange={(e) => setFormData({ ...formData, image_url: e.target.value })} placeholder="https://example.com/image.jpg" required />
-                  </div>
+                    <div>
+                      <Label htmlFor="image_url">URL Gambar</Label>
+                      <Input id="image_url" data-testid="menu-image-input" type="url" value={formData.image_url} onChange={(e) => setFormData({ ...formData, image_url: e.target.value })} placeholder="https://example.com/image.jpg" required />
+                    </div>
 
-                  <div>
-                    <Label htmlFor="description">Deskripsi</Label>
-                    <Input id="description" data-testid="menu-description-input" value={formData.description} onChange={(e) => setFormData({ ...formData, description: e.target.value })} required />
-                  </div>
+                    <div>
+                      <Label htmlFor="description">Deskripsi</Label>
+                      <Input id="description" data-testid="menu-description-input" value={formData.description} onChange={(e) => setFormData({ ...formData, description: e.target.value })} required />
+                    </div>
 
-                  <div className="flex items-center gap-2">
-                    <input id="available" data-testid="menu-available-checkbox" type="checkbox" checked={formData.available} onChange={(e) => setFormData({ ...formData, available: e.target.checked })} className="w-4 h-4" />
-                    <Label htmlFor="available" className="cursor-pointer">
-                      Tersedia
-                    </Label>
-                  </div>
+                    <div>
+                      <Label htmlFor="stock">Stok (kosongkan jika tidak dilacak)</Label>
+                      <Input
+                        id="stock"
+                        data-testid="menu-stock-input"
+                        type="number"
+                        min="0"
+                        value={formData.stock}
+                        onChange={(e) => {
+                          const stock = e.target.value;
+                          // Isi ulang stok otomatis membuat menu tersedia kembali
+                          setFormData({ ...formData, stock, available: stock !== '' && parseInt(stock, 10) > 0 ? true : formData.available });
+                        }}
+                      />
+                    </div>
 
-                  <div className="flex gap-3 pt-4">
-                    <Button type="button" variant="outline" onClick={handleCloseDialog} className="flex-1">
-                      Batal
-                    </Button>
-                    <Button data-testid="save-menu-item-btn" type="submit" className="flex-1 bg-amber-600 hover:bg-amber-700">
-                      {editingItem ? 'Perbarui' : 'Tambah'}
-                    </Button>
-                  </div>
-                </form>
-              </DialogContent>
-            </Dialog>
+                    <div className="flex items-center gap-2">
+                      <input id="available" data-testid="menu-available-checkbox" type="checkbox" checked={formData.available} onChange={(e) => setFormData({ ...formData, available: e.target.checked })} className="w-4 h-4" />
+                      <Label htmlFor="available" className="cursor-pointer">
+                        Tersedia
+                      </Label>
+                    </div>
+
+                    <div className="flex gap-3 pt-4">
+                      <Button type="button" variant="outline" onClick={handleCloseDialog} className="flex-1">
+                        Batal
+                      </Button>
+                      <Button data-testid="save-menu-item-btn" type="submit" className="flex-1 bg-amber-600 hover:bg-amber-700">
+                        {editingItem ? 'Perbarui' : 'Tambah'}
+                      </Button>
+                    </div>
+                  </form>
+                </DialogContent>
+              </Dialog>
+            </div>
           </div>
         </div>
       </div>
@@ -236,6 +291,9 @@ const AdminMenu = () => {
                   </div>
                   <p className="text-sm text-gray-600 mb-3">{item.description}</p>
                   <p className="text-2xl font-bold text-amber-700 mb-4">Rp {item.price.toLocaleString('id-ID')}</p>
+                  {item.stock !== null && item.stock !== undefined && (
+                    <p data-testid={`admin-menu-stock-${item.id}`} className="text-sm text-gray-600 -mt-3 mb-4">Stok: {item.stock}</p>
+                  )}
                   <div className="flex gap-2">
                     <Button data-testid={`edit-menu-btn-${item.id}`} onClick={() => handleOpenDialog(item)} variant="outline" className="flex-1 border-amber-300 hover:bg-amber-50" size="sm">
                       <Pencil className="w-4 h-4 mr-1" />
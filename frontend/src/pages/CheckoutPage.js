@@ -58,7 +58,9 @@ const CheckoutPage = () => {
     setLoading(true);
 
     try {
+      const outletId = localStorage.getItem('outlet_id');
       const orderData = {
+        ...(outletId && { outlet_id: outletId }),
         customer_name: customerName,
         table_number: tableNumber || null,
         items: cart.map((item) => ({
@@ -77,7 +79,14 @@ const CheckoutPage = () => {
       navigate(`/order/${response.data.id}`);
     } catch (error) {
       console.error('Error creating order:', error);
-      toast.error('Gagal membuat pesanan. Silakan coba lagi.');
+      if (error.response?.status === 409) {
+        toast.error(`Stok habis: ${error.response.data.detail}`);
+      } else if (error.response?.status === 400 || error.response?.status === 404) {
+        // Outlet tidak dikenal atau item bukan dari menu outlet ini
+        toast.error('Menu tidak tersedia di outlet ini. Silakan muat ulang menu.');
+      } else {
+        toast.error('Gagal membuat pesanan. Silakan coba lagi.');
+      }
     } finally {
       setLoading(false);
     }
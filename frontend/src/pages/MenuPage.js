@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
-import { useNavigate } from 'react-router-dom';
+import io from 'socket.io-client';
+import { useNavigate, useSearchParams } from 'react-router-dom';
 import { Button } from '../components/ui/button';
 import { Card, CardContent } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
@@ -16,20 +17,51 @@ const MenuPage = () => {
   const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState('all');
   const navigate = useNavigate();
+  const [searchParams] = useSearchParams();
 
   useEffect(() => {
-    fetchMenu();
+    // Outlet dari QR code (?outlet=...), disimpan untuk checkout
+    const outletParam = searchParams.get('outlet');
+    if (outletParam && outletParam !== localStorage.getItem('outlet_id')) {
+      localStorage.setItem('outlet_id', outletParam);
+      localStorage.removeItem('cart'); // Keranjang dari outlet lain tidak berlaku
+    }
+    const outletId = localStorage.getItem('outlet_id');
+    fetchMenu(outletId);
     loadCart();
+
+    // Menu yang stoknya habis langsung disembunyikan
+    const socket = io(BACKEND_URL, {
+      transports: ['websocket', 'polling'],
+    });
+    socket.on('connect', () => {
+      socket.emit('join_menu_room', { outlet_id: outletId });
+    });
+    socket.on('menu_item_updated', (data) => {
+      if (!data.available) {
+        setMenuItems((items) => items.filter((item) => item.id !== data.id));
+      }
+    });
+
+    return () => {
+      socket.disconnect();
+    };
   }, []);
 
-  const fetchMenu = async () => {
+  const fetchMenu = async (outletId) => {
     try {
-      const response = await axios.get(`${API}/menu`);
+      const response = await axios.get(`${API}/menu`, {
+        params: outletId ? { outlet_id: outletId } : {},
+      });
       setMenuItems(response.data);
       setLoading(false);
     } catch (error) {
       console.error('Error fetching menu:', error);
-      toast.error('Gagal memuat menu');
+      if (error.response?.status === 404) {
+        toast.error('Outlet tidak ditemukan');
+      } else {
+        toast.error('Gagal memuat menu');
+      }
       setLoading(false);
     }
   };
@@ -1,8 +1,7 @@
 // OrderStatusPage.js
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import axios from 'axios';
-import io from 'socket.io-client';
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
@@ -44,38 +43,41 @@ const OrderStatusPage = () => {
   const { orderId } = useParams();
   const navigate = useNavigate();
   const [order, setOrder] = useState(null);
+  const [queue, setQueue] = useState(null);
   const [loading, setLoading] = useState(true);
-  const [socket, setSocket] = useState(null);
+  const lastStatus = useRef(null);
 
   useEffect(() => {
     fetchOrder();
 
-    // Connect to Socket.IO
-    const newSocket = io(BACKEND_URL, {
-      transports: ['websocket', 'polling'],
-    });
-
-    newSocket.on('connect', () => {
-      console.log('Connected to WebSocket');
-      newSocket.emit('join_order_room', { order_id: orderId });
-    });
+    // Server-Sent Events: satu koneksi HTTP satu arah untuk status & antrian
+    const events = new EventSource(`${API}/orders/${orderId}/events`);
 
-    newSocket.on('order_status_updated', (data) => {
+    events.addEventListener('order_status_updated', (event) => {
+      const data = JSON.parse(event.data);
       console.log('Order status updated:', data);
-      if (data.order_id === orderId) {
-        setOrder((prevOrder) => ({
-          ...prevOrder,
-          status: data.status,
-          updated_at: data.updated_at,
-        }));
+      if (lastStatus.current && lastStatus.current !== data.status) {
         toast.success(`Status pesanan diperbarui: ${statusConfig[data.status]?.label}`);
       }
+      lastStatus.current = data.status;
+      setOrder((prevOrder) => prevOrder && {
+        ...prevOrder,
+        status: data.status,
+        updated_at: data.updated_at,
+      });
+      if (data.status === 'completed' || data.status === 'cancelled') {
+        setQueue(null);
+        events.close(); // Server menutup stream, jangan reconnect
+      }
     });
 
-    setSocket(newSocket);
+    // Posisi antrian dan estimasi waktu dikirim server saat antrian berubah
+    events.addEventListener('queue_position_updated', (event) => {
+      setQueue(JSON.parse(event.data));
+    });
 
     return () => {
-      newSocket.disconnect();
+      events.close();
     };
   }, [orderId]);
 
@@ -151,6 +153,12 @@ const OrderStatusPage = () => {
                   <span className="font-semibold">Meja:</span> {order.table_number}
                 </p>
               )}
+              {queue && (
+                <p data-testid="order-queue-info" className="text-base text-amber-800">
+                  <span className="font-semibold">Antrian ke-{queue.position}</span>
+                  {' '}&middot; estimasi {Math.max(1, Math.ceil(queue.eta_seconds / 60))} menit
+                </p>
+              )}
             </div>
 
             {/* Progress Steps */}